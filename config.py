@@ -2,11 +2,56 @@
 配置管理模块
 负责加载、保存和管理应用程序的配置设置
 """
+import itertools
 import json
 import os
 import sys
+from dataclasses import dataclass
 from pathlib import Path
-from typing import List
+from typing import List, Optional, Tuple
+
+
+# 忽略清单版本号生成器，全局单调递增，不同 Config 实例之间也不会重复
+_ignore_patterns_versions = itertools.count(1)
+
+
+def _optional_non_negative_int(value, default: Optional[int]) -> Optional[int]:
+    """
+    校验配置文件中的数值设置
+    
+    Args:
+        value: 配置文件中的值
+        default: 值无效时使用的默认值
+        
+    Returns:
+        非负整数或None（无限），值无效（如小数、字符串、负数）时返回默认值
+    """
+    if value is None:
+        return None
+    if isinstance(value, int) and not isinstance(value, bool) and value >= 0:
+        return value
+    return default
+
+
+@dataclass(frozen=True)
+class ConfigSnapshot:
+    """
+    配置快照（不可变）
+    
+    生成文件树时交给后台线程使用，界面在扫描期间修改配置也不会影响正在进行的扫描；
+    提供与 Config 相同的读取接口，可直接传给 FileTreeGenerator
+    """
+    ignore_hidden: bool
+    ignore_patterns: Tuple[str, ...]
+    ignore_patterns_version: int
+    max_depth: Optional[int]
+    max_items_per_level: Optional[int]
+    unlimit_root_items: bool
+    output_format: str
+    
+    def get_ignore_patterns_list(self) -> List[str]:
+        """获取忽略清单"""
+        return list(self.ignore_patterns)
 
 
 class Config:
@@ -32,7 +77,7 @@ class Config:
             config_dir: 配置文件目录，如果为None则使用项目目录
         """
         self.ignore_hidden = True
-        self.ignore_patterns: List[str] = self.DEFAULT_IGNORE_PATTERNS.copy()
+        self.ignore_patterns = self.DEFAULT_IGNORE_PATTERNS.copy()
         self.max_depth = 4  # 默认最大深度为4
         self.max_items_per_level = 15  # 每层最大显示条目数，默认15
         self.unlimit_root_items = True  # 根目录文件数不限制，默认开启
@@ -57,6 +102,40 @@ class Config:
                 
         self.config_file = config_dir / 'filetreer_config.json'
     
+    @property
+    def ignore_patterns(self) -> List[str]:
+        """忽略清单"""
+        return self._ignore_patterns
+    
+    @ignore_patterns.setter
+    def ignore_patterns(self, patterns: List[str]):
+        """设置忽略清单，同时更新版本号，供使用方判断缓存是否失效"""
+        self._ignore_patterns = patterns
+        self._ignore_patterns_version = next(_ignore_patterns_versions)
+        # 换行分隔字符串的缓存，清单变化后在下次读取时重建
+        self._ignore_patterns_string = None
+    
+    @property
+    def ignore_patterns_version(self) -> int:
+        """
+        忽略清单的版本号，每次赋值 ignore_patterns 都会变化
+        
+        注意：直接原地修改列表（如 append）不会更新版本号，修改时请重新赋值
+        """
+        return self._ignore_patterns_version
+    
+    def snapshot(self) -> ConfigSnapshot:
+        """创建当前配置的不可变快照"""
+        return ConfigSnapshot(
+            ignore_hidden=self.ignore_hidden,
+            ignore_patterns=tuple(self.ignore_patterns),
+            ignore_patterns_version=self.ignore_patterns_version,
+            max_depth=self.max_depth,
+            max_items_per_level=self.max_items_per_level,
+            unlimit_root_items=self.unlimit_root_items,
+            output_format=self.output_format
+        )
+    
     def to_dict(self) -> dict:
         """将配置转换为字典"""
         return {
@@ -72,8 +151,8 @@ class Config:
         """从字典加载配置"""
         self.ignore_hidden = data.get('ignore_hidden', True)
         self.ignore_patterns = data.get('ignore_patterns', self.DEFAULT_IGNORE_PATTERNS.copy())
-        self.max_depth = data.get('max_depth', 4)
-        self.max_items_per_level = data.get('max_items_per_level', 15)
+        self.max_depth = _optional_non_negative_int(data.get('max_depth', 4), 4)
+        self.max_items_per_level = _optional_non_negative_int(data.get('max_items_per_level', 15), 15)
         self.unlimit_root_items = data.get('unlimit_root_items', True)
         output_format = data.get('output_format', 'ascii')
         if output_format in ['ascii', 'markdown']:
@@ -123,6 +202,8 @@ class Config:
             self.ignore_patterns = all_patterns
     
     def get_ignore_patterns_string(self) -> str:
-        """获取忽略清单字符串（换行分隔）"""
-        return '\n'.join(self.ignore_patterns)
+        """获取忽略清单字符串（换行分隔），结果缓存到下次修改忽略清单为止"""
+        if self._ignore_patterns_string is None:
+            self._ignore_patterns_string = '\n'.join(self._ignore_patterns)
+        return self._ignore_patterns_string
 
@@ -3,373 +3,798 @@
 负责扫描目录并生成不同格式的文件树
 """
 import os
+import re
 import fnmatch
+import itertools
+import threading
+from array import array
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import List, Tuple, Optional
-from config import Config
+from typing import Iterator, List, Tuple, Optional, Union
+from config import Config, ConfigSnapshot
+
+try:
+    import hyperscan  # 可选依赖：大量忽略模式时使用多模式 DFA 匹配
+except ImportError:
+    hyperscan = None
+
+
+# 与 fnmatch.fnmatch 保持一致：在大小写不敏感的系统（Windows）上忽略大小写
+_IGNORE_CASE = os.path.normcase('A') == 'a'
+
+# 通配符模式数量超过该值且 hyperscan 可用时，改用 hyperscan 匹配
+_HYPERSCAN_MIN_PATTERNS = 32
+
+# 并行扫描目录的线程数（scandir 等系统调用期间会释放 GIL）
+_SCAN_WORKERS = min(32, (os.cpu_count() or 1) * 4)
+
+
+def _has_magic(pattern: str) -> bool:
+    """
+    判断忽略条目是否按通配符处理
+    
+    只有 * 和 ? 会使条目成为通配符模式；仅含 [...] 的条目（如 [old]）按名称精确匹配，
+    与此前的行为一致。通配符模式中的 [...] 仍按 fnmatch 规则作为字符集
+    """
+    return '*' in pattern or '?' in pattern
+
+
+def _is_literal(text: str) -> bool:
+    """判断通配符模式去掉首尾 * 后的部分是否为纯字面量（不含任何 fnmatch 特殊字符）"""
+    return not ('*' in text or '?' in text or '[' in text)
+
+
+def _compile_union(patterns: List[str]):
+    """
+    将多个通配符模式合并编译为一个正则，匹配时只需一次 C 级调用
+    
+    Args:
+        patterns: 通配符模式列表
+        
+    Returns:
+        提供 match 方法的匹配器（正则或 hyperscan），模式列表为空时返回 None
+    """
+    if not patterns:
+        return None
+    union = '|'.join('(?:' + fnmatch.translate(os.path.normcase(p)) + ')' for p in patterns)
+    regex = re.compile(union, re.IGNORECASE if _IGNORE_CASE else 0)
+    
+    # 模式很多时（如粘贴了完整的 .gitignore），正则分支回溯的开销随模式数线性增长，
+    # 此时改用 hyperscan 编译的多模式 DFA，一次线性扫描完成匹配
+    if hyperscan is not None and len(patterns) > _HYPERSCAN_MIN_PATTERNS:
+        try:
+            return _HyperscanMatcher(patterns, regex)
+        except hyperscan.error as e:
+            print(f"hyperscan 编译忽略清单失败，使用正则匹配: {e}")
+    return regex
+
+
+def _glob_to_hs_expression(pattern: str) -> str:
+    """
+    将通配符模式转换为 hyperscan 可接受的正则表达式
+    
+    fnmatch.translate 在新版本 Python 中会生成 hyperscan 不支持的语法（如反向引用），
+    因此这里按 fnmatch 的规则单独转换：* 匹配任意字符串，? 匹配单个字符，[...] 为字符集
+    """
+    pattern = os.path.normcase(pattern)
+    i, n = 0, len(pattern)
+    parts = []
+    while i < n:
+        c = pattern[i]
+        i += 1
+        if c == '*':
+            parts.append('.*')
+        elif c == '?':
+            parts.append('.')
+        elif c == '[':
+            j = i
+            if j < n and pattern[j] == '!':
+                j += 1
+            if j < n and pattern[j] == ']':
+                j += 1
+            while j < n and pattern[j] != ']':
+                j += 1
+            if j >= n:
+                # 没有闭合的 ]，按字面量处理
+                parts.append('\\[')
+            else:
+                stuff = pattern[i:j].replace('\\', '\\\\')
+                i = j + 1
+                if stuff[0] == '!':
+                    stuff = '^' + stuff[1:]
+                elif stuff[0] == '^':
+                    stuff = '\\' + stuff
+                parts.append('[' + stuff + ']')
+        else:
+            parts.append(re.escape(c))
+    return '^(?:' + ''.join(parts) + ')\\z'
+
+
+def _stop_on_match(*_args) -> bool:
+    """hyperscan 匹配回调：命中任意模式即终止扫描"""
+    return True
+
+
+class _HyperscanMatcher:
+    """基于 hyperscan 的多模式匹配器，提供与 re.Pattern 相同的 match 接口"""
+    
+    def __init__(self, patterns: List[str], fallback: 're.Pattern'):
+        """
+        编译 hyperscan 数据库
+        
+        Args:
+            patterns: 通配符模式列表
+            fallback: 等价的正则，用于无法编码为 UTF-8 的文件名
+        """
+        flags = hyperscan.HS_FLAG_DOTALL | hyperscan.HS_FLAG_SINGLEMATCH | hyperscan.HS_FLAG_UTF8
+        if _IGNORE_CASE:
+            flags |= hyperscan.HS_FLAG_CASELESS
+        self._db = hyperscan.Database()
+        self._db.compile(
+            expressions=[_glob_to_hs_expression(p).encode('utf-8') for p in patterns],
+            ids=list(range(len(patterns))),
+            flags=[flags] * len(patterns)
+        )
+        self._fallback = fallback
+        # scratch 不能被多个线程同时使用，每个扫描线程各自分配一份
+        self._local = threading.local()
+    
+    def match(self, text: str) -> bool:
+        """判断 text 是否完整匹配任意模式"""
+        try:
+            data = text.encode('utf-8')
+        except UnicodeEncodeError:
+            # 含代理字符的文件名（非法编码）交给正则处理
+            return self._fallback.match(text) is not None
+        scratch = getattr(self._local, 'scratch', None)
+        if scratch is None:
+            scratch = self._local.scratch = hyperscan.Scratch(self._db)
+        try:
+            self._db.scan(data, match_event_handler=_stop_on_match, scratch=scratch)
+        except hyperscan.ScanTerminated:
+            return True
+        return False
+
+
+def _should_ignore(name: str, path_str: str, is_dir: bool, ignore_hidden: bool,
+                   exact_set: set, matchers: tuple) -> bool:
+    """
+    判断条目是否应该被忽略（扫描热路径使用，模块级函数，所需状态全部通过参数传入）
+    
+    Args:
+        name: 文件或文件夹名
+        path_str: 完整路径字符串
+        is_dir: 是否为目录
+        ignore_hidden: 是否忽略隐藏文件
+        exact_set: 精确匹配的名称集合
+        matchers: (后缀元组, 前缀元组, 文件名正则, 完整路径正则, 目录名正则, 目录完整路径正则)
+        
+    Returns:
+        True 如果应该忽略，False 否则
+    """
+    # 检查隐藏文件
+    if ignore_hidden and name.startswith('.'):
+        return True
+    
+    # 先检查精确匹配（这些模式不包含通配符，也不以/结尾）
+    if name in exact_set:
+        return True
+    
+    return _matches_patterns(name, path_str, is_dir, matchers)
+
+
+def _matches_patterns(name: str, path_str: str, is_dir: bool, matchers: tuple) -> bool:
+    """
+    用预编译的匹配器检查条目是否命中通配符类忽略模式
+    
+    Args:
+        name: 文件或文件夹名
+        path_str: 完整路径字符串
+        is_dir: 是否为目录
+        matchers: (后缀元组, 前缀元组, 文件名正则, 完整路径正则, 目录名正则, 目录完整路径正则)
+        
+    Returns:
+        True 如果命中任意模式，False 否则
+    """
+    ext_tuple, prefix_tuple, name_re, path_re, dir_name_re, dir_path_re = matchers
+    
+    # 再检查后缀匹配（*.ext）和前缀匹配（prefix*），各为单次 C 级调用
+    if ext_tuple or prefix_tuple:
+        key = name.lower() if _IGNORE_CASE else name
+        if key.endswith(ext_tuple) or key.startswith(prefix_tuple):
+            return True
+    
+    # 最后检查合并后的通配符正则（文件名、完整路径各一次）
+    if name_re is not None and name_re.match(name):
+        return True
+    if path_re is not None and path_re.match(path_str):
+        return True
+    
+    # 目录匹配模式只对目录生效，同样按是否包含/分别匹配目录名或完整路径
+    if is_dir:
+        if dir_name_re is not None and dir_name_re.match(name):
+            return True
+        if dir_path_re is not None and dir_path_re.match(path_str):
+            return True
+    
+    return False
+
+
+def _name_sort_key(item: Tuple[str, int, bool, str, Optional[bool]]) -> str:
+    """条目排序键：不区分大小写的文件名"""
+    return item[3].lower()
+
+
+class FileTree:
+    """
+    文件树存储（结构数组）
+    
+    各字段分别保存在并行的紧凑数组中，而不是为每个条目创建一个元组，
+    减少每个条目的内存占用，渲染时按下标顺序读取
+    """
+    
+    # flags 取值：普通条目、省略号（使用 └──）、省略号（使用 ├──）
+    FLAG_NONE = 0
+    FLAG_ELLIPSIS = 1
+    FLAG_ELLIPSIS_BRANCH = 2
+    
+    __slots__ = ('paths', 'depths', 'is_dir', 'names', 'flags')
+    
+    def __init__(self):
+        """创建空的文件树"""
+        self.paths: List[str] = []  # 相对路径
+        self.depths = array('H')  # 深度
+        self.is_dir = bytearray()  # 是否为目录
+        self.names: List[str] = []  # 文件名
+        self.flags = bytearray()  # 省略号标记
+    
+    def append(self, item: Tuple[str, int, bool, str, Optional[bool]]):
+        """
+        追加一个条目
+        
+        Args:
+            item: (相对路径, 深度, 是否为目录, 文件名, 是否有更多文件被省略)
+        """
+        path, depth, is_dir, name, has_more_files = item
+        self.paths.append(path)
+        self.depths.append(depth)
+        self.is_dir.append(is_dir)
+        self.names.append(name)
+        if path == "...":
+            self.flags.append(self.FLAG_ELLIPSIS_BRANCH if has_more_files else self.FLAG_ELLIPSIS)
+        else:
+            self.flags.append(self.FLAG_NONE)
+    
+    def __len__(self) -> int:
+        return len(self.names)
+    
+    def truncate(self, count: int):
+        """
+        只保留前 count 个条目
+        
+        Args:
+            count: 保留的条目数
+        """
+        del self.paths[count:]
+        del self.depths[count:]
+        del self.is_dir[count:]
+        del self.names[count:]
+        del self.flags[count:]
+    
+    @property
+    def dir_count(self) -> int:
+        """目录数量"""
+        return self.is_dir.count(1)
+    
+    @property
+    def file_count(self) -> int:
+        """文件数量（不含省略号条目）"""
+        return self.flags.count(self.FLAG_NONE) - self.dir_count
+    
+    def __iter__(self) -> Iterator[Tuple[str, int, bool, str, Optional[bool]]]:
+        """按 (相对路径, 深度, 是否为目录, 文件名, 是否有更多文件被省略) 元组逐个产出条目"""
+        for path, depth, is_dir, name, flag in zip(self.paths, self.depths, self.is_dir, self.names, self.flags):
+            yield path, depth, bool(is_dir), name, (flag == self.FLAG_ELLIPSIS_BRANCH) if flag else None
 
 
 class FileTreeGenerator:
     """文件树生成器类"""
     
-    def __init__(self, config: Config):
-        """初始化生成器"""
+    # 分块生成文本时每块包含的条目数
+    RENDER_CHUNK_ENTRIES = 4096
+    
+    def __init__(self, config: Union[Config, ConfigSnapshot]):
+        """
+        初始化生成器
+        
+        Args:
+            config: 配置对象，也可以是配置快照
+        """
         self.config = config
-        self.file_tree: List[Tuple[str, int, bool, str, Optional[bool]]] = []  # (path, depth, is_dir, name, has_more_files)
-        # 缓存忽略清单，避免重复获取
-        self._ignore_patterns = None
+        self.file_tree = FileTree()
+        # 缓存忽略清单，避免重复获取；以配置中的版本号判断缓存是否失效
+        self._ignore_patterns_version = None
         self._ignore_patterns_set = None  # 精确匹配的集合，用于快速查找
+        # 其余匹配器：(后缀元组, 前缀元组, 文件名正则, 完整路径正则, 目录名正则, 目录完整路径正则)
+        self._ignore_matchers = None
+        # 输出格式到分块生成方法的映射
+        self._renderers = {
+            'ascii': self.iter_ascii_tree,
+            'markdown': self.iter_markdown_tree,
+        }
+    
+    @property
+    def output_format(self) -> str:
+        """实际使用的输出格式，配置中的格式未知时使用 ASCII 格式"""
+        output_format = self.config.output_format
+        return output_format if output_format in self._renderers else 'ascii'
     
     def _get_ignore_patterns(self):
-        """获取并缓存忽略清单"""
-        if self._ignore_patterns is None:
-            self._ignore_patterns = self.config.get_ignore_patterns_list()
-            # 创建精确匹配的集合，用于快速查找
-            # 排除包含通配符的模式和以/结尾的目录匹配模式
-            self._ignore_patterns_set = {p for p in self._ignore_patterns 
-                                        if '*' not in p and '?' not in p and not p.endswith('/')}
-        return self._ignore_patterns, self._ignore_patterns_set
-    
-    def should_ignore(self, path: Path, is_dir: Optional[bool] = None) -> bool:
+        """获取并缓存忽略清单，按匹配方式分桶并预编译"""
+        version = self.config.ignore_patterns_version
+        if self._ignore_patterns_version != version:
+            exact_set = set()
+            ext_list = []
+            prefix_list = []
+            dir_name_patterns = []
+            dir_path_patterns = []
+            complex_patterns = []
+            path_patterns = []
+            for pattern in self.config.get_ignore_patterns_list():
+                if pattern.endswith('/'):
+                    # 目录匹配模式：只匹配目录，去掉末尾的/
+                    dir_pattern = pattern[:-1]
+                    if '/' in dir_pattern:
+                        dir_path_patterns.append(dir_pattern)
+                    else:
+                        dir_name_patterns.append(dir_pattern)
+                elif not _has_magic(pattern):
+                    # 精确匹配（不包含通配符）
+                    exact_set.add(pattern)
+                elif pattern.startswith('*') and _is_literal(pattern[1:]) and '/' not in pattern:
+                    # 纯后缀模式，如 *.pyc、*~
+                    ext_list.append(os.path.normcase(pattern[1:]))
+                elif pattern.endswith('*') and _is_literal(pattern[:-1]) and '/' not in pattern:
+                    # 纯前缀模式，如 test*
+                    prefix_list.append(os.path.normcase(pattern[:-1]))
+                elif '/' in pattern:
+                    # 包含路径分隔符的模式只可能匹配完整路径
+                    path_patterns.append(pattern)
+                else:
+                    # 不含/的模式只需匹配文件名，无需再拿完整路径匹配
+                    complex_patterns.append(pattern)
+            self._ignore_patterns_set = exact_set
+            self._ignore_matchers = (
+                tuple(ext_list),
+                tuple(prefix_list),
+                _compile_union(complex_patterns),
+                _compile_union(path_patterns),
+                _compile_union(dir_name_patterns),
+                _compile_union(dir_path_patterns)
+            )
+            # 匹配器全部就绪后再记录版本号，其他线程不会读到未编译完成的缓存
+            self._ignore_patterns_version = version
+        return self._ignore_patterns_set, self._ignore_matchers
+    
+    def should_ignore(self, name: str, path_str: str, is_dir: bool) -> bool:
         """
         判断是否应该忽略该路径
         
+        直接接收 os.scandir 条目提供的字符串，不再构造 Path 对象
+        
         Args:
-            path: 文件或文件夹路径
-            is_dir: 是否为目录，如果为None则自动检测
+            name: 文件或文件夹名
+            path_str: 完整路径字符串
+            is_dir: 是否为目录
             
         Returns:
             True 如果应该忽略，False 否则
         """
-        name = path.name
-        
-        # 如果未提供 is_dir，尝试检测（但可能不准确，建议在调用时提供）
-        if is_dir is None:
-            try:
-                is_dir = path.is_dir()
-            except OSError:
-                is_dir = False
-        
-        # 检查隐藏文件
-        if self.config.ignore_hidden and name.startswith('.'):
-            return True
-        
-        # 获取缓存的忽略清单
-        ignore_patterns, ignore_patterns_set = self._get_ignore_patterns()
-        
-        # 先检查精确匹配（这些模式不包含通配符，也不以/结尾）
-        if name in ignore_patterns_set:
-            return True
-        
-        # 再检查通配符匹配和目录匹配模式
-        for pattern in ignore_patterns:
-            if pattern not in ignore_patterns_set:  # 跳过已检查的精确匹配
-                # 检查是否为目录匹配模式（以/结尾）
-                if pattern.endswith('/'):
-                    # 目录匹配模式：只匹配目录
-                    if not is_dir:
-                        # 当前项不是目录，跳过该模式
-                        continue
-                    # 去掉末尾的/后进行匹配
-                    pattern_without_slash = pattern[:-1]
-                    if fnmatch.fnmatch(name, pattern_without_slash) or fnmatch.fnmatch(str(path), pattern_without_slash):
-                        return True
-                else:
-                    # 普通模式：匹配文件和目录
-                    if fnmatch.fnmatch(name, pattern) or fnmatch.fnmatch(str(path), pattern):
-                        return True
-        
-        return False
+        exact_set, matchers = self._get_ignore_patterns()
+        return _should_ignore(name, path_str, is_dir, self.config.ignore_hidden, exact_set, matchers)
     
-    def scan_directory(self, root_path: Path, current_depth: int = 0) -> List[Tuple[str, int, bool, str, Optional[bool]]]:
+    def _scan_entries(self, dir_path: str, depth: int, parent_len: int) -> List[Tuple[str, int, bool, str, Optional[bool]]]:
         """
-        递归扫描目录，在扫描过程中应用每层条目数限制
+        扫描单个目录的直接子项，排序并应用每层条目数限制
         
         Args:
-            root_path: 要扫描的根目录
-            current_depth: 当前深度
+            dir_path: 目录完整路径
+            depth: 子项所在深度
+            parent_len: 根目录父路径前缀的长度，用于切片得到相对路径
             
         Returns:
-            文件树列表，每个元素为 (相对路径, 深度, 是否为目录, 文件名, 是否有更多文件被省略)
+            子项列表（必要时末尾附带省略号条目），格式同 scan_directory
         """
-        file_tree = []
-        
-        # 检查最大深度限制
-        if self.config.max_depth is not None and current_depth >= self.config.max_depth:
-            return file_tree
+        # 热循环中用到的配置提前取到局部变量，避免每个条目都经过 self/config 属性查找
+        ignore_hidden = self.config.ignore_hidden
+        exact_set, matchers = self._get_ignore_patterns()
+        has_patterns = any(matchers)
         
         try:
+            # 目录和文件在扫描时就分开收集，排序键只需比较名称
             entries = []
-            with os.scandir(root_path) as it:
+            files = []
+            with os.scandir(dir_path) as it:
                 for entry in it:
-                    entry_path = Path(entry.path)
-                    is_dir = entry.is_dir()
-                    if not self.should_ignore(entry_path, is_dir=is_dir):
-                        entries.append((entry_path, is_dir))
-            
-            # 排序：目录在前，然后按名称排序
-            entries.sort(key=lambda x: (not x[1], x[0].name.lower()))
-            
-            # 应用每层条目数限制
-            # 如果是根目录且设置了根目录不限制，则不限制
-            if current_depth == 0 and self.config.unlimit_root_items:
-                entries_to_process = [item[0] for item in entries]
-                has_more = False
-            elif self.config.max_items_per_level is not None:
-                max_items = self.config.max_items_per_level
-                entries_to_process = [item[0] for item in entries[:max_items]]
-                has_more = len(entries) > max_items
-            else:
-                # 无限
-                entries_to_process = [item[0] for item in entries]
-                has_more = False
-            
-            # 计算父目录路径（用于 relative_path）
-            parent_path = root_path.parent
-            
-            # 处理所有条目
-            for entry in entries_to_process:
-                # 使用相对路径字符串，避免重复的Path操作
-                try:
-                    relative_path = str(entry.relative_to(parent_path))
-                except ValueError:
-                    # 如果路径不在同一根下，使用绝对路径
-                    relative_path = str(entry)
-                name = entry.name
-                file_tree.append((relative_path, current_depth, entry.is_dir(), name, None))
-                
-                # 如果是目录，递归扫描
-                if entry.is_dir():
-                    sub_tree = self.scan_directory(entry, current_depth + 1)
-                    file_tree.extend(sub_tree)
-            
-            # 如果有更多条目被省略，在所有直接子项（包括递归子项）处理完后添加省略号
-            # 省略号应该和该目录下的直接子项同级，所以 depth 是 current_depth
-            if has_more:
-                # 检查被省略的条目中是否还有文件（entries 是 (Path, is_dir) 元组列表）
-                omitted_entries = entries[max_items:]
-                has_files_in_omitted = any(not item[1] for item in omitted_entries)
-                
-                # 检查最后一个处理的条目是否是目录
-                last_processed_is_dir = entries_to_process[-1].is_dir() if entries_to_process else False
-                
-                # 如果被省略的条目中还有文件，且最后一个处理的条目是目录，使用 ├──
-                # 否则使用 └──
-                use_branch = has_files_in_omitted and last_processed_is_dir
-                
-                # 添加省略号，深度为 current_depth（与直接子项同级）
-                file_tree.append(("...", current_depth, False, "...", use_branch))
-        
+                    name = entry.name
+                    # 隐藏文件和精确匹配直接在循环内判断，命中时连 is_dir 都不用查询
+                    # （在不提供 d_type 的文件系统上，is_dir 需要一次 stat 系统调用）
+                    if (ignore_hidden and name.startswith('.')) or name in exact_set:
+                        continue
+                    # is_dir 只调用一次，结果随条目传递，不再重复检测
+                    is_dir = entry.is_dir(follow_symlinks=False)
+                    path = entry.path
+                    if has_patterns and _matches_patterns(name, path, is_dir, matchers):
+                        continue
+                    (entries if is_dir else files).append((path[parent_len:], depth, is_dir, name, None))
         except PermissionError:
             # 权限错误，跳过该目录
-            pass
+            return []
         except Exception as e:
             # 其他错误，记录但继续
-            print(f"扫描目录 {root_path} 时出错: {e}")
-        
-        return file_tree
+            print(f"扫描目录 {dir_path} 时出错: {e}")
+            return []
+        
+        # 排序：目录在前，然后按名称排序
+        # 目录、文件分别排序后拼接，键为单个字符串，比 (not is_dir, name) 元组键的比较开销小
+        entries.sort(key=_name_sort_key)
+        files.sort(key=_name_sort_key)
+        entries.extend(files)
+        
+        # 应用每层条目数限制（原地截断，不复制列表）
+        # 如果是根目录且设置了根目录不限制，则不限制
+        max_items = self.config.max_items_per_level
+        if (depth == 0 and self.config.unlimit_root_items) or max_items is None or len(entries) <= max_items:
+            return entries
+        
+        # 有更多条目被省略，在所有直接子项之后添加省略号
+        # 省略号应该和该目录下的直接子项同级，所以 depth 与子项相同
+        # 条目已按目录在前排序，被省略的条目中有文件，当且仅当最后一个条目是文件
+        has_files_in_omitted = not entries[-1][2]
+        
+        # 检查最后一个处理的条目是否是目录
+        last_processed_is_dir = entries[max_items - 1][2] if max_items > 0 else False
+        
+        # 如果被省略的条目中还有文件，且最后一个处理的条目是目录，使用 ├──
+        # 否则使用 └──
+        use_branch = has_files_in_omitted and last_processed_is_dir
+        del entries[max_items:]
+        entries.append(("...", depth, False, "...", use_branch))
+        
+        return entries
     
-    def filter_ellipsis_children(self, file_tree: List[Tuple[str, int, bool, str, Optional[bool]]]) -> List[Tuple[str, int, bool, str, Optional[bool]]]:
+    def scan_directory(self, root_path: Path, current_depth: int = 0, out: Optional[FileTree] = None,
+                       cancel_event: Optional[threading.Event] = None) -> FileTree:
         """
-        过滤掉省略号后面的所有子项
+        扫描目录，在扫描过程中应用每层条目数限制
         
         Args:
-            file_tree: 原始文件树列表
+            root_path: 要扫描的根目录
+            current_depth: 当前深度
+            out: 用于接收结果的文件树，条目直接追加到其中；为None时新建
+            cancel_event: 取消标记，被设置后停止扫描，只保留已扫描的部分
             
         Returns:
-            过滤后的文件树列表
+            文件树（即 out）
         """
-        if not file_tree:
-            return file_tree
-        
-        filtered_tree = []
-        skip_until_depth = None
-        
-        for i, (path, depth, is_dir, name, has_more_files) in enumerate(file_tree):
-            if path == "...":
-                # 遇到省略号，标记需要跳过后续更深层的项
-                filtered_tree.append((path, depth, is_dir, name, has_more_files))
-                # skip_until_depth 应该是省略号深度+1
-                # 这样只会跳过该目录下的子项（递归子项），不会影响其他目录
-                skip_until_depth = depth + 1
-            elif skip_until_depth is not None:
-                # 如果当前项比省略号的深度更深，跳过
-                if depth >= skip_until_depth:
-                    continue
-                else:
-                    # 遇到同级或更浅的项，停止跳过
-                    skip_until_depth = None
-                    filtered_tree.append((path, depth, is_dir, name, has_more_files))
-            else:
-                filtered_tree.append((path, depth, is_dir, name, has_more_files))
+        if out is None:
+            out = FileTree()
+        append = out.append
+        for item in self.iter_tree(root_path, current_depth, cancel_event):
+            append(item)
+        return out
+    
+    def iter_tree(self, root_path: Path, current_depth: int = 0,
+                  cancel_event: Optional[threading.Event] = None) -> Iterator[Tuple[str, int, bool, str, Optional[bool]]]:
+        """
+        扫描目录，按深度优先顺序逐个产出条目，在扫描过程中应用每层条目数限制
         
-        return filtered_tree
+        分两个阶段：先按层用线程池并行列出各目录的子项，再按深度优先顺序串行产出；
+        省略号在所属目录的全部子项之后产出
+        
+        Args:
+            root_path: 要扫描的根目录
+            current_depth: 当前深度
+            cancel_event: 取消标记，被设置后不再列出新的目录，已扫描的部分照常产出
+            
+        Yields:
+            (相对路径, 深度, 是否为目录, 文件名, 是否有更多文件被省略)
+        """
+        # 检查最大深度限制
+        # 子项深度达到上限的目录直接作为叶子输出，不再 scandir
+        max_depth = self.config.max_depth
+        if max_depth is None:
+            max_depth = float('inf')
+        if current_depth >= max_depth:
+            return
+        
+        # 相对路径以根目录的父目录为基准，预先计算前缀，用字符串切片代替 Path.relative_to
+        # 前缀直接取自传给 scandir 的根目录字符串：str(root_path.parent) 对只有一级的相对路径
+        # （如 Path('proj')）是 '.'，而 scandir 返回的路径前面没有 './'
+        root_str = str(root_path)
+        if root_path.name:
+            parent_prefix = root_str[:len(root_str) - len(root_path.name)]
+        else:
+            # 根目录没有名称（如 '.' 或 '/'），子项路径直接接在根目录之后
+            parent_prefix = os.path.join(root_str, '')
+        parent_len = len(parent_prefix)
+        
+        # 在主线程中预先编译忽略清单，避免工作线程重复初始化缓存
+        self._get_ignore_patterns()
+        
+        root_entries = self._scan_entries(root_str, current_depth, parent_len)
+        
+        # 第一阶段：逐层并行扫描，结果按目录相对路径保存
+        # 被忽略和被省略的条目不会出现在列表中，因此不会扫描其子树（与 os.fwalk 就地裁剪
+        # dirnames 的效果相同）。这里仍按路径而不是 dir_fd 打开目录：os.fwalk 和基于 fd 的
+        # scandir 在 Windows 上不可用，且逐层并行时需要同时持有整层目录的 fd，容易超出进程上限
+        listings = {}
+        depth = current_depth + 1
+        level = [item[0] for item in root_entries if item[2]]
+        
+        def _scan_or_cancel(dir_path: str, depth: int, parent_len: int):
+            # 已取消时，本层尚未开始的目录不再列出
+            if cancel_event.is_set():
+                return []
+            return self._scan_entries(dir_path, depth, parent_len)
+        
+        if cancel_event is not None:
+            scan_entries = _scan_or_cancel
+        else:
+            scan_entries = self._scan_entries
+        
+        if level and depth < max_depth:
+            with ThreadPoolExecutor(max_workers=_SCAN_WORKERS) as executor:
+                while level and depth < max_depth:
+                    if cancel_event is not None and cancel_event.is_set():
+                        break
+                    results = executor.map(
+                        scan_entries,
+                        [parent_prefix + relative_path for relative_path in level],
+                        itertools.repeat(depth),
+                        itertools.repeat(parent_len)
+                    )
+                    next_level = []
+                    for relative_path, children in zip(level, results):
+                        listings[relative_path] = children
+                        next_level.extend(item[0] for item in children if item[2])
+                    level = next_level
+                    depth += 1
+        
+        # 第二阶段：按深度优先顺序产出，栈顶为下一个要输出的条目，子项逆序入栈以保持排序顺序
+        stack = root_entries
+        stack.reverse()
+        
+        while stack:
+            item = stack.pop()
+            yield item
+            
+            # 如果是已扫描的目录，其子项入栈
+            if item[2]:
+                children = listings.get(item[0])
+                if children:
+                    stack.extend(reversed(children))
     
-    def generate_ascii_tree(self, root_name: str, file_tree: List[Tuple[str, int, bool, str, Optional[bool]]]) -> str:
+    def generate_ascii_tree(self, root_name: str, file_tree: FileTree) -> str:
         """
         生成ASCII艺术树格式
         
         Args:
             root_name: 根目录名称
-            file_tree: 文件树列表
+            file_tree: 文件树
             
         Returns:
             ASCII格式的文件树字符串
         """
-        # 使用列表收集所有行，最后一次性join
-        lines = [root_name + '/']
+        return ''.join(self.iter_ascii_tree(root_name, file_tree))
+    
+    def iter_ascii_tree(self, root_name: str, file_tree: FileTree) -> Iterator[str]:
+        """
+        分块生成ASCII艺术树格式，每块最多包含 RENDER_CHUNK_ENTRIES 个条目
         
-        if not file_tree:
-            return '\n'.join(lines)
-        
-        # 预先为每个深度建立索引，记录每个深度在哪些位置出现
-        depth_indices = {}  # {depth: [indices]}
-        for i, (_, depth, _, _, _) in enumerate(file_tree):
-            if depth not in depth_indices:
-                depth_indices[depth] = []
-            depth_indices[depth].append(i)
-        
-        # 对于每个位置i和每个深度d，检查深度d在位置i之后是否还有条目
-        # 这用于决定是否显示竖线
-        def has_next_at_depth(pos: int, depth: int) -> bool:
-            """检查深度depth在位置pos之后是否还有条目"""
-            if depth not in depth_indices:
-                return False
-            # 找到深度depth的所有条目位置中，第一个大于pos的位置
-            for idx in depth_indices[depth]:
-                if idx > pos:
-                    return True
-            return False
-        
-        def is_last_in_parent(pos: int, depth: int) -> bool:
-            """判断位置pos的条目是否是父目录下的最后一个条目"""
-            if depth == 0:
-                # 根目录下的条目，判断是否是整个文件树的最后一个条目
-                return pos == len(file_tree) - 1
-            
-            # 从当前位置的下一个位置开始查找
-            for j in range(pos + 1, len(file_tree)):
-                next_depth = file_tree[j][1]
-                if next_depth == depth:
-                    # 找到了相同深度的条目，说明当前条目不是最后一个
-                    return False
-                if next_depth < depth:
-                    # 找到了更上层的条目（父目录的兄弟或更上层），说明当前条目是父目录下的最后一个
-                    return True
+        Args:
+            root_name: 根目录名称
+            file_tree: 文件树
             
-            # 没找到，说明当前条目是整个文件树的最后一个条目
-            return True
+        Yields:
+            文件树文本片段，按顺序拼接即为完整内容
+        """
+        # 换行、前缀和名称作为独立片段追加到同一个列表，每块结束时 join 一次，
+        # 不再为每行先拼接出中间字符串
+        parts = [root_name, '/']
+        append = parts.append
         
-        for i, (path, depth, is_dir, name, has_more_files) in enumerate(file_tree):
-            # 判断是否是父目录下的最后一个条目
-            is_last = is_last_in_parent(i, depth)
-            
-            # 构建前缀（使用列表拼接）
-            prefix_parts = []
-            for d in range(depth):
-                if has_next_at_depth(i, d):
-                    prefix_parts.append('│   ')
-                else:
-                    prefix_parts.append('    ')
-            prefix = ''.join(prefix_parts)
-            
-            # 添加连接符
-            if path == "...":
-                # has_more_files 表示：被省略的条目中还有文件，且最后一个处理的条目是目录
-                if has_more_files:
-                    prefix += '├── '
-                else:
-                    prefix += '└── '
-                display_name = "..."
-            else:
-                if is_last:
-                    prefix += '└── '
+        if not file_tree:
+            yield ''.join(parts)
+            return
+        
+        depths = file_tree.depths
+        is_dirs = file_tree.is_dir
+        names = file_tree.names
+        flags = file_tree.flags
+        count = len(depths)
+        
+        # 从后向前遍历一次，预先计算每个条目在父目录下是否还有后续兄弟：
+        # mask 的第 d 位表示当前位置之后、遇到更浅条目之前，深度 d 上还有条目
+        has_next_sibling = bytearray(count)
+        mask = 0
+        for i in range(count - 1, -1, -1):
+            depth = depths[i]
+            has_next_sibling[i] = (mask >> depth) & 1
+            # 对于更前面的条目：当前条目阻断了更深层的兄弟关系，并在本深度上成为后续兄弟
+            mask = (mask & ((1 << depth) - 1)) | (1 << depth)
+        
+        # 竖线前缀栈：bar_prefixes[d] 为深度 d 的条目的竖线部分，由父目录的竖线前缀再加一段得到，
+        # 只在遇到目录时压入一次，每个条目直接取用，无需按深度逐段重建
+        # 文件树不一定从深度 0 开始（如从非 0 深度扫描），更浅的列用空白补齐
+        bar_prefixes = ['    ' * d for d in range(min(depths) + 1)]
+        
+        chunk_size = self.RENDER_CHUNK_ENTRIES
+        for start in range(0, count, chunk_size):
+            for i in range(start, min(start + chunk_size, count)):
+                depth = depths[i]
+                bars = bar_prefixes[depth]
+                
+                flag = flags[i]
+                if flag:
+                    # FLAG_ELLIPSIS_BRANCH 表示：被省略的条目中还有文件，且最后一个处理的条目是目录，使用 ├──
+                    has_next = flag == FileTree.FLAG_ELLIPSIS_BRANCH
+                    display_name = "..."
                 else:
-                    prefix += '├── '
+                    # 不是父目录下的最后一个条目时使用 ├──
+                    has_next = has_next_sibling[i]
+                    display_name = names[i]
                 
-                display_name = name
-                if is_dir:
-                    display_name += '/'
+                append('\n')
+                append(bars)
+                append('├── ' if has_next else '└── ')
+                append(display_name)
+                if is_dirs[i]:
+                    append('/')
+                    # 子项的竖线前缀：本目录后面还有兄弟时继续画竖线
+                    del bar_prefixes[depth + 1:]
+                    bar_prefixes.append(bars + ('│   ' if has_next else '    '))
             
-            lines.append(prefix + display_name)
-        
-        return '\n'.join(lines)
+            yield ''.join(parts)
+            parts.clear()
     
-    def generate_markdown_tree(self, root_name: str, file_tree: List[Tuple[str, int, bool, str, Optional[bool]]]) -> str:
+    def generate_markdown_tree(self, root_name: str, file_tree: FileTree) -> str:
         """
         生成Markdown格式的文件树
         
         Args:
             root_name: 根目录名称
-            file_tree: 文件树列表
+            file_tree: 文件树
             
         Returns:
             Markdown格式的文件树字符串
         """
-        lines = [f'- {root_name}/']
-        
-        # 预先计算常用缩进字符串，避免重复计算
-        max_depth = max((d for _, d, _, _, _ in file_tree), default=0)
-        indent_cache = {}
-        for depth in range(max_depth + 2):
-            indent_cache[depth] = '    ' * depth
+        return ''.join(self.iter_markdown_tree(root_name, file_tree))
+    
+    def iter_markdown_tree(self, root_name: str, file_tree: FileTree) -> Iterator[str]:
+        """
+        分块生成Markdown格式的文件树，每块最多包含 RENDER_CHUNK_ENTRIES 个条目
         
-        for path, depth, is_dir, name, _ in file_tree:
-            indent = indent_cache[depth + 1]
+        Args:
+            root_name: 根目录名称
+            file_tree: 文件树
             
-            if path == "...":
-                display_name = "..."
-            else:
-                display_name = name
-                if is_dir:
-                    display_name += '/'
+        Yields:
+            文件树文本片段，按顺序拼接即为完整内容
+        """
+        # 与 ASCII 格式相同，换行+缩进+列表标记作为一个片段，名称作为另一个片段，每块结束时 join 一次
+        parts = ['- ', root_name, '/']
+        append = parts.append
+        
+        depths = file_tree.depths
+        is_dirs = file_tree.is_dir
+        names = file_tree.names
+        flags = file_tree.flags
+        count = len(depths)
+        
+        if not count:
+            yield ''.join(parts)
+            return
+        
+        # 预先计算每个深度的行前缀（换行、缩进和列表标记），每个条目只需取用
+        max_depth = max(depths)
+        prefix_by_depth = ['\n' + '    ' * depth + '- ' for depth in range(max_depth + 2)]
+        
+        chunk_size = self.RENDER_CHUNK_ENTRIES
+        for start in range(0, count, chunk_size):
+            for i in range(start, min(start + chunk_size, count)):
+                append(prefix_by_depth[depths[i] + 1])
+                if flags[i]:
+                    append("...")
+                else:
+                    append(names[i])
+                    if is_dirs[i]:
+                        append('/')
             
-            lines.append(f'{indent}- {display_name}')
-        
-        return '\n'.join(lines)
+            yield ''.join(parts)
+            parts.clear()
     
-    def generate(self, root_path: Path) -> dict:
+    def iter_generate(self, root_path: Path, cancel_event: Optional[threading.Event] = None) -> Iterator[str]:
         """
-        生成文件树（所有格式）
+        扫描目录并按配置的输出格式分块生成文件树
+        
+        扫描完成后逐块产出文本，调用方可以边接收边显示；
+        迭代结束后可通过 file_tree 获取本次扫描结果
         
         Args:
             root_path: 要扫描的根目录路径
+            cancel_event: 取消标记；扫描期间被设置时停止扫描并生成已扫描的部分，
+                生成期间被设置时停止生成，file_tree 截断为已产出的条目
             
-        Returns:
-            包含不同格式文件树的字典
+        Yields:
+            文件树文本片段，按顺序拼接即为完整内容
         """
-        # 重置文件树
-        self.file_tree = []
+        # 扫描目录（限制和省略号已在扫描过程中处理），结果直接写入新的文件树
+        self.file_tree = FileTree()
+        self.scan_directory(root_path, current_depth=0, out=self.file_tree, cancel_event=cancel_event)
         
-        # 扫描目录（限制已在扫描过程中应用）
-        raw_file_tree = self.scan_directory(root_path, current_depth=0)
+        root_name = root_path.name
         
-        # 过滤掉省略号后面的子项
-        self.file_tree = self.filter_ellipsis_children(raw_file_tree)
+        file_tree = self.file_tree
+        renderer = self._renderers[self.output_format]
+        
+        # 扫描期间已取消：已扫描的部分规模有限，完整生成，调用方得到的就是这部分结果
+        if cancel_event is None or cancel_event.is_set():
+            yield from renderer(root_name, file_tree)
+            return
+        
+        # 生成期间取消：在块与块之间停止，并把文件树截断到已产出的条目，使统计信息与内容一致；
+        # 每块产出后才检查，因此至少会产出包含根目录的第一块
+        emitted = 0
+        for chunk in renderer(root_name, file_tree):
+            yield chunk
+            emitted = min(emitted + self.RENDER_CHUNK_ENTRIES, len(file_tree))
+            if cancel_event.is_set():
+                file_tree.truncate(emitted)
+                return
+    
+    def iter_generate_tagged(self, root_path: Path, cancel_event: Optional[threading.Event] = None
+                             ) -> Iterator[Tuple[str, List[Optional[str]]]]:
+        """
+        与 iter_generate 相同，同时给出片段中每个新行的标签，供界面直接按标签插入
         
-        root_name = root_path.name
+        目录所在行（包括根目录）的标签为 'dir'，其余行为 None
         
-        result = {}
+        Args:
+            root_path: 要扫描的根目录路径
+            cancel_event: 取消标记，被设置后停止扫描和生成，只产出已完成的部分
+            
+        Yields:
+            (文本片段, 标签列表)；第一个片段包含根目录行，之后每个片段以换行开头，
+            标签列表与片段中换行开始的各行一一对应
+        """
+        tag_table = (None, 'dir')
+        start = 0
+        for chunk in self.iter_generate(root_path, cancel_event):
+            # 每个片段对应 RENDER_CHUNK_ENTRIES 个条目，第一个片段还包含根目录行
+            is_dirs = self.file_tree.is_dir
+            tags = ['dir'] if start == 0 else []
+            end = min(start + self.RENDER_CHUNK_ENTRIES, len(is_dirs))
+            tags.extend([tag_table[is_dir] for is_dir in is_dirs[start:end]])
+            start = end
+            yield chunk, tags
+    
+    def generate(self, root_path: Path, cancel_event: Optional[threading.Event] = None) -> dict:
+        """
+        生成文件树（所有格式）
         
-        # 根据配置生成相应格式
-        if self.config.output_format == 'ascii':
-            content = self.generate_ascii_tree(root_name, self.file_tree)
-            result['content'] = content
-            result['format'] = 'ascii'
-        elif self.config.output_format == 'markdown':
-            content = self.generate_markdown_tree(root_name, self.file_tree)
-            result['content'] = content
-            result['format'] = 'markdown'
-        else:
-            # 默认使用 ASCII 格式
-            content = self.generate_ascii_tree(root_name, self.file_tree)
-            result['content'] = content
-            result['format'] = 'ascii'
+        Args:
+            root_path: 要扫描的根目录路径
+            cancel_event: 取消标记，被设置后停止扫描和生成，返回已完成的部分
+            
+        Returns:
+            包含不同格式文件树的字典
+        """
+        result = {}
+        result['content'] = ''.join(self.iter_generate(root_path, cancel_event))
+        result['format'] = self.output_format
         
-        # 添加统计信息（在扫描时统计，避免再次遍历）
-        file_count = sum(1 for item in self.file_tree if not item[2])  # 文件数量
-        dir_count = sum(1 for item in self.file_tree if item[2])  # 目录数量
-        result['stats'] = {'files': file_count, 'dirs': dir_count}
+        # 添加统计信息（省略号不计入文件数）
+        result['stats'] = {'files': self.file_tree.file_count, 'dirs': self.file_tree.dir_count}
         
         return result
-
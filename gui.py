@@ -5,14 +5,215 @@
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox, scrolledtext
 from pathlib import Path
+from typing import List, Optional
+import os
+import queue
+import tempfile
 import threading
-from config import Config
+from config import Config, ConfigSnapshot
 from filetree_generator import FileTreeGenerator
 
 
+def _current_umask() -> int:
+    """读取进程的 umask（只能通过设置再恢复的方式读取，在导入时于主线程中执行一次）"""
+    mask = os.umask(0)
+    os.umask(mask)
+    return mask
+
+
+# 新建文件的默认权限，临时文件由 mkstemp 以 0600 创建，替换前按此恢复
+_NEW_FILE_MODE = 0o666 & ~_current_umask()
+
+
+class WindowedText(ttk.Frame):
+    """
+    只载入部分行的文本框
+    
+    完整内容以行列表保存在 Python 中，Text 控件中只保留当前滚动位置附近的 WINDOW_LINES 行；
+    滚动条按完整内容的行数换算位置，滚动到已载入部分的边缘时重新载入
+    """
+    
+    # Text 控件中最多保留的行数
+    WINDOW_LINES = 2000
+    # 顶部可见行距离已载入部分边缘少于该行数时重新载入
+    EDGE_LINES = 200
+    
+    def __init__(self, master, **kwargs):
+        """
+        创建文本框
+        
+        Args:
+            master: 父组件
+            **kwargs: 传给 tk.Text 的参数
+        """
+        super().__init__(master)
+        self.columnconfigure(0, weight=1)
+        self.rowconfigure(0, weight=1)
+        
+        self.text = tk.Text(self, **kwargs)
+        self.vbar = ttk.Scrollbar(self, orient=tk.VERTICAL, command=self._on_scrollbar)
+        self.text.configure(yscrollcommand=self._on_text_scroll)
+        self.text.grid(row=0, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
+        self.vbar.grid(row=0, column=1, sticky=(tk.N, tk.S))
+        
+        self._lines: List[str] = ['']  # 完整内容，按行保存
+        self._tags: List[Optional[str]] = [None]  # 每行的标签，与 _lines 一一对应
+        self._start = 0  # Text 中第一行在完整内容中的行号
+        self._reload_pending = False
+    
+    @property
+    def _end(self) -> int:
+        """Text 中最后一行之后的行号"""
+        return min(self._start + self.WINDOW_LINES, len(self._lines))
+    
+    def set_text(self, content: str, tags: Optional[List[Optional[str]]] = None):
+        """
+        替换全部内容，并滚动到开头
+        
+        Args:
+            content: 文本内容
+            tags: 每行的标签，为None时所有行都不带标签
+        """
+        self._lines = content.split('\n')
+        self._tags = tags if tags is not None else [None] * len(self._lines)
+        self._load(0)
+    
+    def append(self, content: str, tags: Optional[List[Optional[str]]] = None):
+        """
+        在末尾追加内容
+        
+        Args:
+            content: 文本内容，第一行接在当前最后一行之后
+            tags: content 中每个新行的标签（不含接在最后一行之后的部分），为None时不带标签
+        """
+        lines = self._lines
+        old_count = len(lines)
+        at_end = self._end == old_count
+        tail = content.split('\n')
+        if tags is None:
+            tags = [None] * (len(tail) - 1)
+        lines[-1] += tail[0]
+        lines.extend(tail[1:])
+        self._tags.extend(tags)
+        
+        if at_end:
+            # 已载入部分包含末尾：把窗口内还放得下的部分追加到 Text 中
+            room = self._start + self.WINDOW_LINES - old_count
+            self._insert_lines(tk.END, tail[:room + 1], self._tags[old_count - 1], tags[:room])
+        else:
+            # 只需更新滚动条
+            self._on_text_scroll(*self.text.yview())
+    
+    def _insert_lines(self, index: str, lines: List[str], first_tag: Optional[str], tags: List[Optional[str]]):
+        """
+        插入若干行，相邻的同标签行合并为一段，所有段在一次 insert 调用中插入
+        
+        Args:
+            index: 插入位置
+            lines: 要插入的行，第一行接在插入位置之后，其余各行前加换行
+            first_tag: 第一行的标签
+            tags: 其余各行的标签
+        """
+        args = []
+        run = [lines[0]]
+        run_tag = first_tag
+        for line, tag in zip(lines[1:], tags):
+            if tag != run_tag:
+                args.append(''.join(run))
+                args.append(run_tag or '')
+                run = []
+                run_tag = tag
+            run.append('\n')
+            run.append(line)
+        args.append(''.join(run))
+        args.append(run_tag or '')
+        self.text.insert(index, *args)
+    
+    def _load(self, start: int):
+        """
+        重新载入 Text 中的内容
+        
+        Args:
+            start: 载入的第一行在完整内容中的行号
+        """
+        self._start = start = max(0, min(start, len(self._lines) - self.WINDOW_LINES))
+        end = self._end
+        self.text.delete(1.0, tk.END)
+        self._insert_lines('1.0', self._lines[start:end], self._tags[start], self._tags[start + 1:end])
+    
+    def _top_line(self) -> int:
+        """当前顶部可见行在完整内容中的行号"""
+        return self._start + int(self.text.index('@0,0').split('.')[0]) - 1
+    
+    def _show_line(self, line: int):
+        """
+        滚动到指定行，必要时以该行为中心重新载入
+        
+        Args:
+            line: 完整内容中的行号，滚动后位于顶部
+        """
+        line = max(0, min(line, len(self._lines) - 1))
+        near_top = line < self._start + self.EDGE_LINES and self._start > 0
+        near_bottom = line > self._end - self.EDGE_LINES and self._end < len(self._lines)
+        if near_top or near_bottom:
+            self._load(line - self.WINDOW_LINES // 2)
+        self.text.yview(f'{line - self._start + 1}.0')
+    
+    def _on_scrollbar(self, *args):
+        """滚动条拖动或点击：按完整内容的行数换算目标行"""
+        total = len(self._lines)
+        if total <= self.WINDOW_LINES:
+            self.text.yview(*args)
+            return
+        
+        if args[0] == 'moveto':
+            line = int(float(args[1]) * total)
+        else:
+            # ('scroll', 数量, 'units' 或 'pages')
+            amount = int(args[1])
+            if args[2] == 'pages':
+                first, last = self.text.yview()
+                amount *= max(1, int((last - first) * (self._end - self._start)))
+            line = self._top_line() + amount
+        self._show_line(line)
+    
+    def _on_text_scroll(self, first, last):
+        """Text 滚动后，把已载入部分内的位置换算为完整内容中的位置并更新滚动条"""
+        first = float(first)
+        last = float(last)
+        total = len(self._lines)
+        count = self._end - self._start
+        self.vbar.set((self._start + first * count) / total, (self._start + last * count) / total)
+        
+        # 通过滚轮或键盘滚动到已载入部分的边缘时，空闲时以当前位置为中心重新载入
+        if total > self.WINDOW_LINES and not self._reload_pending:
+            if (first * count < self.EDGE_LINES and self._start > 0) or \
+                    ((1 - last) * count < self.EDGE_LINES and self._end < total):
+                self._reload_pending = True
+                self.after_idle(self._reload_around_top)
+    
+    def _reload_around_top(self):
+        """以当前顶部可见行为中心重新载入"""
+        self._reload_pending = False
+        self._show_line(self._top_line())
+
+
 class FileTreeApp:
     """文件树生成器主窗口"""
     
+    # 输出格式，下标与格式单选按钮的值对应
+    OUTPUT_FORMATS = ('ascii', 'markdown')
+    
+    # 轮询生成结果队列的间隔（毫秒）
+    PREVIEW_POLL_MS = 30
+    
+    # 保存文件时的写缓冲区大小
+    SAVE_BUFFER_SIZE = 1 << 20
+    
+    # 提示自动消失前的显示时间（毫秒）和状态栏高亮颜色
+    TOAST_MS = 2000
+    TOAST_COLOR = '#c8e6c9'
+    
     def __init__(self, root: tk.Tk, config: Config):
         """
         初始化应用程序
@@ -24,7 +225,19 @@ class FileTreeApp:
         self.root = root
         self.config = config
         self.selected_path: Path = None
+        # 选择文件夹时记录其是否存在，避免每次生成或保存都在界面线程中 stat
+        self._path_exists = False
         self.generated_result: dict = {}
+        self._save_pending = False  # 后台保存进行中，期间保存按钮保持禁用
+        self._preview_chunks: list = []  # 正在显示的生成结果片段
+        # 复用同一个生成器：每次生成时换上新的配置快照，忽略清单的预编译结果按版本号缓存
+        self._generator = FileTreeGenerator(self.config)
+        
+        # 常驻的后台工作线程，从请求队列中依次取出 (根目录, 配置快照, 结果队列, 取消标记) 执行生成
+        self._cancel_event = threading.Event()
+        self._request_queue = queue.SimpleQueue()
+        self._worker = threading.Thread(target=self._worker_loop, daemon=True)
+        self._worker.start()
         
         # 设置窗口
         self.root.title("文件树生成器 - FileTreer")
@@ -82,12 +295,13 @@ class FileTreeApp:
         format_frame = ttk.LabelFrame(config_frame, text="输出格式", padding="5")
         format_frame.grid(row=1, column=0, columnspan=2, sticky=(tk.W, tk.E), pady=5)
         
-        self.format_var = tk.StringVar(value='ascii')
+        # 单选按钮的值为 OUTPUT_FORMATS 中的下标
+        self.format_var = tk.IntVar(value=0)
         
-        ttk.Radiobutton(format_frame, text="ASCII 艺术树", variable=self.format_var, value='ascii').grid(
+        ttk.Radiobutton(format_frame, text="ASCII 艺术树", variable=self.format_var, value=0).grid(
             row=0, column=0, padx=5
         )
-        ttk.Radiobutton(format_frame, text="Markdown 格式", variable=self.format_var, value='markdown').grid(
+        ttk.Radiobutton(format_frame, text="Markdown 格式", variable=self.format_var, value=1).grid(
             row=0, column=1, padx=5
         )
         
@@ -122,13 +336,22 @@ class FileTreeApp:
             height=12
         )
         self.ignore_patterns_text.grid(row=0, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
+        # 忽略清单内容有修改时才重新解析
+        self._patterns_dirty = True
+        self.ignore_patterns_text.bind('<<Modified>>', self._on_patterns_modified)
+        
+        # 数字输入框只允许输入数字或留空
+        digits_vcmd = (self.root.register(self._validate_digits), '%P')
         
         # 最大深度
         ttk.Label(settings_frame, text="最大深度（留空为无限）:").grid(
             row=3, column=0, sticky=tk.W, pady=2
         )
         self.max_depth_var = tk.StringVar()
-        depth_entry = ttk.Entry(settings_frame, textvariable=self.max_depth_var, width=10)
+        depth_entry = ttk.Entry(
+            settings_frame, textvariable=self.max_depth_var, width=10,
+            validate='key', validatecommand=digits_vcmd
+        )
         depth_entry.grid(row=3, column=1, sticky=tk.W, padx=5, pady=2)
         
         # 每层最大文件数
@@ -136,7 +359,10 @@ class FileTreeApp:
             row=4, column=0, sticky=tk.W, pady=2
         )
         self.max_items_var = tk.StringVar()
-        items_entry = ttk.Entry(settings_frame, textvariable=self.max_items_var, width=10)
+        items_entry = ttk.Entry(
+            settings_frame, textvariable=self.max_items_var, width=10,
+            validate='key', validatecommand=digits_vcmd
+        )
         items_entry.grid(row=4, column=1, sticky=tk.W, padx=5, pady=2)
         
         # 根目录文件数不限制
@@ -160,18 +386,39 @@ class FileTreeApp:
         self.generate_button.pack(side=tk.LEFT, padx=5)
     
     def create_preview_tab(self):
-        """创建预览标签页"""
+        """
+        创建预览标签页
+        
+        启动时只创建框架和状态变量，预览区域、按钮和状态栏在第一次切换到该标签页时才创建
+        """
         preview_frame = self.preview_frame
         preview_frame.columnconfigure(0, weight=1)
         preview_frame.rowconfigure(0, weight=1)
         
+        self.status_var = tk.StringVar(value="就绪")
+        self._preview_built = False
+        self.notebook.bind('<<NotebookTabChanged>>', self._on_tab_changed)
+    
+    def _on_tab_changed(self, event=None):
+        """切换标签页"""
+        if self.notebook.index('current') == 1:
+            self._build_preview_widgets()
+    
+    def _build_preview_widgets(self):
+        """创建预览标签页中的组件（只创建一次）"""
+        if self._preview_built:
+            return
+        self._preview_built = True
+        preview_frame = self.preview_frame
+        
         # 预览区域
         preview_label_frame = ttk.LabelFrame(preview_frame, text="预览", padding="5")
         preview_label_frame.grid(row=0, column=0, sticky=(tk.W, tk.E, tk.N, tk.S), pady=5)
         preview_label_frame.columnconfigure(0, weight=1)
         preview_label_frame.rowconfigure(0, weight=1)
         
-        self.preview_text = scrolledtext.ScrolledText(
+        # 只载入可见位置附近的行，大文件树也能流畅滚动
+        self.preview_text = WindowedText(
             preview_label_frame, 
             wrap=tk.NONE,
             font=('Consolas', 10),
@@ -179,6 +426,7 @@ class FileTreeApp:
             height=35
         )
         self.preview_text.grid(row=0, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
+        self.preview_text.text.tag_configure('dir', foreground='blue')
         
         # 操作按钮区域
         action_frame = ttk.Frame(preview_frame)
@@ -201,9 +449,8 @@ class FileTreeApp:
         self.save_button.pack(side=tk.LEFT, padx=5)
         
         # 状态栏
-        self.status_var = tk.StringVar(value="就绪")
-        status_bar = ttk.Label(preview_frame, textvariable=self.status_var, relief=tk.SUNKEN)
-        status_bar.grid(row=2, column=0, sticky=(tk.W, tk.E), pady=5)
+        self.status_bar = ttk.Label(preview_frame, textvariable=self.status_var, relief=tk.SUNKEN)
+        self.status_bar.grid(row=2, column=0, sticky=(tk.W, tk.E), pady=5)
     
     def load_config_to_ui(self):
         """将配置加载到UI"""
@@ -229,42 +476,43 @@ class FileTreeApp:
         self.unlimit_root_var.set(self.config.unlimit_root_items)
         
         # 格式选择
-        self.format_var.set(self.config.output_format)
+        self.format_var.set(self.OUTPUT_FORMATS.index(self.config.output_format))
     
     def save_ui_to_config(self):
         """将UI设置保存到配置"""
         self.config.ignore_hidden = self.ignore_hidden_var.get()
         
-        # 处理忽略清单（从Text widget读取，换行分隔）
-        patterns_str = self.ignore_patterns_text.get(1.0, tk.END)
-        self.config.set_ignore_patterns_from_string(patterns_str)
+        # 处理忽略清单（从Text widget读取，换行分隔），内容未修改时跳过
+        if self._patterns_dirty:
+            patterns_str = self.ignore_patterns_text.get(1.0, tk.END)
+            self.config.set_ignore_patterns_from_string(patterns_str)
+            self._patterns_dirty = False
         
-        # 处理最大深度
-        depth_str = self.max_depth_var.get().strip()
-        if depth_str:
-            try:
-                self.config.max_depth = int(depth_str)
-            except ValueError:
-                self.config.max_depth = 4  # 默认值
-        else:
-            self.config.max_depth = None  # 无限
+        # 处理最大深度（输入框只允许数字，留空为无限）
+        depth_str = self.max_depth_var.get()
+        self.config.max_depth = int(depth_str) if depth_str else None
         
-        # 处理每层最大文件数
-        items_str = self.max_items_var.get().strip()
-        if items_str:
-            try:
-                items = int(items_str)
-                self.config.max_items_per_level = max(1, items)  # 至少为1
-            except ValueError:
-                self.config.max_items_per_level = None  # 无限
-        else:
-            self.config.max_items_per_level = None  # 无限
+        # 处理每层最大文件数（至少为1，留空为无限）
+        items_str = self.max_items_var.get()
+        self.config.max_items_per_level = max(1, int(items_str)) if items_str else None
         
         # 根目录文件数不限制
         self.config.unlimit_root_items = self.unlimit_root_var.get()
         
         # 处理输出格式
-        self.config.output_format = self.format_var.get()
+        self.config.output_format = self.OUTPUT_FORMATS[self.format_var.get()]
+    
+    @staticmethod
+    def _validate_digits(value: str) -> bool:
+        """输入框校验：只允许留空或纯 ASCII 数字（isdigit 也接受 int 无法解析的上标等字符）"""
+        return value == '' or (value.isascii() and value.isdigit())
+    
+    def _on_patterns_modified(self, event=None):
+        """忽略清单内容被修改"""
+        # 重置修改标记也会触发 <<Modified>>，此时标记已为 False，直接忽略
+        if self.ignore_patterns_text.edit_modified():
+            self._patterns_dirty = True
+            self.ignore_patterns_text.edit_modified(False)
     
     def check_unlimited_settings(self):
         """
@@ -300,13 +548,15 @@ class FileTreeApp:
         folder = filedialog.askdirectory(title="选择要扫描的文件夹")
         if folder:
             self.selected_path = Path(folder)
+            # askdirectory 只会返回已存在的目录
+            self._path_exists = True
             self.path_var.set(str(self.selected_path))
             self.generate_button.config(state=tk.NORMAL)
             self.status_var.set(f"已选择: {self.selected_path.name}")
     
     def generate_tree(self):
         """生成文件树（在后台线程中执行）"""
-        if not self.selected_path or not self.selected_path.exists():
+        if not self.selected_path or not self._path_exists:
             messagebox.showerror("错误", "请先选择一个有效的文件夹")
             return
         
@@ -320,60 +570,157 @@ class FileTreeApp:
             if not result:
                 return
         
-        # 禁用按钮，显示状态
-        self.generate_button.config(state=tk.DISABLED)
-        self.copy_button.config(state=tk.DISABLED)
-        self.save_button.config(state=tk.DISABLED)
+        # 预览标签页的组件可能还没有创建
+        self._build_preview_widgets()
+        
+        # 禁用按钮，显示状态；生成按钮在生成期间变为取消按钮
+        self._set_buttons_state(tk.DISABLED)
+        self._cancel_event = threading.Event()
+        self.generate_button.config(text="取消", command=self._cancel_generation, state=tk.NORMAL)
         self.status_var.set("正在扫描文件夹...")
-        self.preview_text.delete(1.0, tk.END)
-        self.preview_text.insert(tk.END, "正在扫描，请稍候...")
+        self.preview_text.set_text("正在扫描，请稍候...")
         
         # 切换到预览标签页
         self.notebook.select(1)
         
-        # 在后台线程中执行扫描
-        thread = threading.Thread(target=self._generate_tree_thread, daemon=True)
-        thread.start()
+        # 交给后台工作线程执行扫描，生成的片段通过队列交给主线程显示
+        chunk_queue = queue.SimpleQueue()
+        self._preview_chunks = []
+        self._request_queue.put((self.selected_path, self.config.snapshot(), chunk_queue, self._cancel_event))
+        self.root.after(self.PREVIEW_POLL_MS, self._drain_queue, chunk_queue)
+    
+    def _cancel_generation(self):
+        """取消正在进行的生成，已完成的部分仍会显示"""
+        self._cancel_event.set()
+        self.generate_button.config(state=tk.DISABLED)
+        self.status_var.set("正在取消...")
     
-    def _generate_tree_thread(self):
-        """在后台线程中生成文件树"""
+    def _restore_generate_button(self):
+        """生成结束后把取消按钮恢复为生成按钮"""
+        self.generate_button.config(text="生成文件树", command=self.generate_tree)
+    
+    def shutdown(self):
+        """关闭窗口前调用：取消正在进行的生成，并通知后台工作线程退出"""
+        self._cancel_event.set()
+        self._request_queue.put(None)
+    
+    def _worker_loop(self):
+        """后台工作线程：依次处理生成请求，收到 None 时退出"""
+        while True:
+            request = self._request_queue.get()
+            if request is None:
+                break
+            self._generate_tree(*request)
+    
+    def _generate_tree(self, root_path: Path, config: ConfigSnapshot, chunk_queue: queue.SimpleQueue,
+                       cancel_event: threading.Event):
+        """
+        在后台线程中生成文件树
+        
+        生成的文本片段依次放入队列，由主线程轮询取出显示；
+        队列中的消息为 (类型, 数据)，类型为 'chunk'、'done' 或 'error'；
+        'chunk' 的数据为 (文本片段, 每个新行的标签)
+        
+        Args:
+            root_path: 要扫描的根目录路径
+            config: 发起生成时的配置快照
+            chunk_queue: 结果队列
+            cancel_event: 取消标记
+        """
         try:
-            generator = FileTreeGenerator(self.config)
-            result = generator.generate(self.selected_path)
-            self.generated_result = result
+            # 文件夹可能在选择之后被删除，在后台线程中再确认一次
+            if not root_path.is_dir():
+                raise FileNotFoundError(f"文件夹不存在: {root_path}")
+            
+            # 使用快照而不是 self.config，扫描期间界面修改配置不会影响本次生成
+            generator = self._generator
+            generator.config = config
+            # 每行的标签在工作线程中计算好，主线程插入时直接带上标签
+            for chunk in generator.iter_generate_tagged(root_path, cancel_event):
+                chunk_queue.put(('chunk', chunk))
             
-            # 在主线程中更新UI
-            self.root.after(0, self._update_preview, result)
+            file_tree = generator.file_tree
+            chunk_queue.put(('done', {
+                'format': generator.output_format,
+                'stats': {'files': file_tree.file_count, 'dirs': file_tree.dir_count},
+                'cancelled': cancel_event.is_set(),
+            }))
         
         except Exception as e:
-            error_msg = f"生成文件树时出错: {str(e)}"
-            self.root.after(0, lambda: messagebox.showerror("错误", error_msg))
-            self.root.after(0, lambda: self.status_var.set("生成失败"))
-            self.root.after(0, lambda: self.generate_button.config(state=tk.NORMAL))
+            chunk_queue.put(('error', f"生成文件树时出错: {str(e)}"))
     
-    def _update_preview(self, result: dict):
-        """更新预览区域"""
-        self.preview_text.delete(1.0, tk.END)
+    def _drain_queue(self, chunk_queue: queue.SimpleQueue):
+        """
+        从队列中取出一条消息并更新预览区域
+        
+        每次只插入一个片段，后续片段在空闲时继续处理，大文件树也不会长时间阻塞界面
+        """
+        try:
+            kind, data = chunk_queue.get_nowait()
+        except queue.Empty:
+            self.root.after(self.PREVIEW_POLL_MS, self._drain_queue, chunk_queue)
+            return
+        
+        if kind == 'chunk':
+            text, line_tags = data
+            if not self._preview_chunks:
+                # 第一个片段到达，替换"正在扫描"提示
+                self.preview_text.set_text(text, line_tags)
+                self.status_var.set("正在显示预览...")
+            else:
+                self.preview_text.append(text, line_tags)
+            self._preview_chunks.append(text)
+            self.root.after_idle(self._drain_queue, chunk_queue)
+            return
         
-        # 显示生成的内容
-        content = result.get('content', '未生成任何内容')
-        self.preview_text.insert(tk.END, content)
+        self._restore_generate_button()
+        
+        if kind == 'error':
+            messagebox.showerror("错误", data)
+            self.status_var.set("生成失败")
+            self.generate_button.config(state=tk.NORMAL)
+            return
+        
+        # 生成完成，保存完整内容供复制和保存使用
+        data['content'] = ''.join(self._preview_chunks)
+        self.generated_result = data
+        self._preview_chunks = []
         
         # 更新状态和按钮
-        stats = result.get('stats', {'files': 0, 'dirs': 0})
+        stats = data['stats']
         file_count = stats['files']
         dir_count = stats['dirs']
-        self.status_var.set(f"生成完成 - 文件: {file_count}, 目录: {dir_count}")
-        self.generate_button.config(state=tk.NORMAL)
-        self.copy_button.config(state=tk.NORMAL)
-        self.save_button.config(state=tk.NORMAL)
+        self._set_buttons_state(tk.NORMAL)
+        if data['cancelled']:
+            self.status_var.set(f"已取消（结果不完整） - 文件: {file_count}, 目录: {dir_count}")
+        else:
+            self.status_var.set(f"生成完成 - 文件: {file_count}, 目录: {dir_count}")
+    
+    def _set_buttons_state(self, state: str):
+        """
+        一次性设置生成、复制、保存三个按钮的状态
+        
+        Args:
+            state: tk.NORMAL 或 tk.DISABLED
+        """
+        # 直接设置 state 选项，三个按钮的修改在同一次空闲重绘中生效；
+        # 后台保存尚未结束时不启用保存按钮
+        buttons = (self.generate_button, self.copy_button, self.save_button)
+        if self._save_pending and state != tk.DISABLED:
+            buttons = buttons[:2]
+        for button in buttons:
+            button['state'] = state
     
     def copy_to_clipboard(self):
         """复制到剪贴板"""
-        content = self.preview_text.get(1.0, tk.END)
+        # 直接使用生成结果，不再从预览控件整体取回文本
+        content = self._get_output_content()
         if content.strip():
-            self.root.clipboard_clear()
-            self.root.clipboard_append(content)
+            # 直接调用 Tk 的 clipboard 命令，内容只经过一次 Tcl 转换；
+            # append 会追加到已有内容之后，仍需先 clear
+            tk_call = self.root.tk.call
+            tk_call('clipboard', 'clear')
+            tk_call('clipboard', 'append', '--', content)
             self.status_var.set("已复制到剪贴板")
         else:
             messagebox.showwarning("警告", "没有可复制的内容")
@@ -387,18 +734,15 @@ class FileTreeApp:
         # 默认保存到扫描目录
         default_filename = self.selected_path / "filetree.txt" if self.selected_path else None
         
-        if default_filename and self.selected_path.exists():
-            # 尝试保存到默认位置
-            try:
-                self._save_content_to_file(default_filename)
-                self.status_var.set(f"已保存到: {default_filename}")
-                messagebox.showinfo("成功", f"文件树已保存到:\n{default_filename}")
-                return
-            except Exception as e:
-                # 如果默认位置保存失败，让用户选择
-                pass
+        if default_filename and self._path_exists:
+            # 尝试保存到默认位置，失败时再让用户选择
+            self._save_content_async(default_filename, ask_on_error=True)
+            return
         
-        # 让用户选择保存位置
+        self._ask_save_location()
+    
+    def _ask_save_location(self):
+        """让用户选择保存位置并保存"""
         filename = filedialog.asksaveasfilename(
             title="保存文件树",
             defaultextension=".txt",
@@ -410,16 +754,109 @@ class FileTreeApp:
         )
         
         if filename:
+            self._save_content_async(Path(filename), ask_on_error=False)
+    
+    def _save_content_async(self, filepath: Path, ask_on_error: bool):
+        """
+        在后台线程中保存文件，完成后回到主线程更新界面
+        
+        Args:
+            filepath: 保存路径
+            ask_on_error: 保存失败时是否让用户重新选择保存位置
+        """
+        self._save_pending = True
+        self.save_button.config(state=tk.DISABLED)
+        self.status_var.set("正在保存...")
+        content = self._get_output_content()
+        thread = threading.Thread(
+            target=self._save_file_thread,
+            args=(filepath, content, ask_on_error),
+            daemon=True
+        )
+        thread.start()
+    
+    def _save_file_thread(self, filepath: Path, content: str, ask_on_error: bool):
+        """在后台线程中写入文件"""
+        try:
+            self._save_content_to_file(filepath, content)
+        except Exception as e:
+            self.root.after(0, self._on_save_error, e, ask_on_error)
+        else:
+            self.root.after(0, self._on_save_done, filepath)
+    
+    def _finish_save(self):
+        """后台保存结束，恢复保存按钮"""
+        self._save_pending = False
+        # 与复制按钮保持一致：保存期间开始了新的生成时，两者都应保持禁用直到生成结束
+        self.save_button['state'] = self.copy_button['state']
+    
+    def _on_save_done(self, filepath: Path):
+        """保存完成"""
+        self._finish_save()
+        self.status_var.set(f"已保存到: {filepath}")
+        # 不弹出模态对话框，只在预览区域下方短暂显示提示并高亮状态栏
+        self._show_toast("文件树已保存")
+    
+    def _show_toast(self, message: str):
+        """
+        显示一条自动消失的提示
+        
+        Args:
+            message: 提示内容
+        """
+        toast = ttk.Label(self.preview_frame, text=message, relief=tk.RAISED, padding=(10, 4))
+        toast.place(relx=0.5, rely=1.0, anchor=tk.S, y=-60)
+        self.status_bar.configure(background=self.TOAST_COLOR)
+        
+        def dismiss():
+            toast.destroy()
+            self.status_bar.configure(background='')
+        
+        self.root.after(self.TOAST_MS, dismiss)
+    
+    def _on_save_error(self, error: Exception, ask_on_error: bool):
+        """保存失败"""
+        self._finish_save()
+        if ask_on_error:
+            # 默认位置保存失败，让用户选择
+            self._ask_save_location()
+        else:
+            self.status_var.set("保存失败")
+            messagebox.showerror("错误", f"保存文件失败: {str(error)}")
+    
+    def _get_output_content(self) -> str:
+        """
+        获取用于复制和保存的内容
+        
+        Returns:
+            生成的文件树文本，末尾带换行（与从预览控件取出的文本一致）
+        """
+        content = self.generated_result.get('content', '')
+        return content + '\n' if content else ''
+    
+    def _save_content_to_file(self, filepath: Path, content: str):
+        """
+        将内容保存到文件
+        
+        先写入同目录下的临时文件再替换目标文件，写入中途失败不会留下不完整的文件；
+        临时文件名唯一，同时进行的多次保存不会互相覆盖，也不会误删用户已有的同名文件
+        """
+        fd, tmp_path = tempfile.mkstemp(dir=filepath.parent, prefix=filepath.name + '.', suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8', buffering=self.SAVE_BUFFER_SIZE) as f:
+                f.write(content)
+            # 保留已有文件的权限，新文件使用默认权限
             try:
-                self._save_content_to_file(Path(filename))
-                self.status_var.set(f"已保存到: {filename}")
-                messagebox.showinfo("成功", f"文件树已保存到:\n{filename}")
-            except Exception as e:
-                messagebox.showerror("错误", f"保存文件失败: {str(e)}")
-    
-    def _save_content_to_file(self, filepath: Path):
-        """将内容保存到文件"""
-        content = self.preview_text.get(1.0, tk.END)
-        with open(filepath, 'w', encoding='utf-8') as f:
-            f.write(content)
+                mode = os.stat(filepath).st_mode & 0o7777
+            except FileNotFoundError:
+                mode = _NEW_FILE_MODE
+            os.chmod(tmp_path, mode)
+            os.replace(tmp_path, filepath)
+        except Exception:
+            # 清理临时文件后继续抛出，由调用方处理
+            try:
+                os.unlink(tmp_path)
+            except OSError:
+                pass
+            raise
 
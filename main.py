@@ -22,6 +22,7 @@ def main():
     def on_closing():
         app.save_ui_to_config()
         config.save_config()
+        app.shutdown()
         root.destroy()
     
     root.protocol("WM_DELETE_WINDOW", on_closing)
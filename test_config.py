@@ -0,0 +1,36 @@
+"""
+配置管理测试
+运行：python -m unittest test_config
+"""
+import tempfile
+import unittest
+from pathlib import Path
+
+from config import Config
+
+
+class FromDictTest(unittest.TestCase):
+    """从配置文件内容加载"""
+
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.config = Config(Path(self._tmp.name))
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def test_invalid_limits_fall_back_to_defaults(self):
+        for value in (4.5, 'abc', '3', -1, True, [1]):
+            self.config.from_dict({'max_depth': value, 'max_items_per_level': value})
+            self.assertEqual(self.config.max_depth, 4, value)
+            self.assertEqual(self.config.max_items_per_level, 15, value)
+
+    def test_valid_limits_are_kept(self):
+        self.config.from_dict({'max_depth': 0, 'max_items_per_level': 30})
+        self.assertEqual((self.config.max_depth, self.config.max_items_per_level), (0, 30))
+        self.config.from_dict({'max_depth': None, 'max_items_per_level': None})
+        self.assertEqual((self.config.max_depth, self.config.max_items_per_level), (None, None))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,237 @@
+"""
+文件树生成器测试
+运行：python -m unittest test_filetree_generator
+"""
+import fnmatch
+import os
+import tempfile
+import threading
+import unittest
+from pathlib import Path
+
+from config import Config
+import filetree_generator
+from filetree_generator import FileTreeGenerator
+
+
+def count_entries(content: str):
+    """
+    统计 ASCII 文件树内容中的文件数和目录数（跳过根目录行和省略号行）
+
+    Returns:
+        (文件数, 目录数)
+    """
+    files = dirs = 0
+    for line in content.split('\n')[1:]:
+        name = line.rsplit('── ', 1)[-1]
+        if name == '...':
+            continue
+        if name.endswith('/'):
+            dirs += 1
+        else:
+            files += 1
+    return files, dirs
+
+
+class CancelAfterListings(FileTreeGenerator):
+    """列出指定数量的目录后设置取消标记的生成器"""
+
+    def __init__(self, config, cancel_event: threading.Event, listings: int):
+        super().__init__(config)
+        self._cancel_event = cancel_event
+        self._remaining = listings
+        self._lock = threading.Lock()
+
+    def _scan_entries(self, dir_path, depth, parent_len):
+        with self._lock:
+            self._remaining -= 1
+            if self._remaining <= 0:
+                self._cancel_event.set()
+        return super()._scan_entries(dir_path, depth, parent_len)
+
+
+class CancelTest(unittest.TestCase):
+    """取消生成"""
+
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.root = Path(self._tmp.name) / 'proj'
+        # 三层目录，每层 6 个子目录，每个目录 2 个文件
+        for a in range(6):
+            for b in range(6):
+                for c in range(6):
+                    leaf = self.root / f'a{a}' / f'b{b}' / f'c{c}'
+                    leaf.mkdir(parents=True)
+                    (leaf / 'f1.txt').touch()
+                    (leaf / 'f2.txt').touch()
+
+        self.config = Config(Path(self._tmp.name))
+        self.config.max_depth = None
+        self.config.max_items_per_level = None
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def test_cancel_during_scan_keeps_scanned_part(self):
+        cancel_event = threading.Event()
+        generator = CancelAfterListings(self.config, cancel_event, listings=10)
+        result = generator.generate(self.root, cancel_event)
+
+        full = FileTreeGenerator(self.config).generate(self.root)
+        self.assertTrue(cancel_event.is_set())
+        self.assertNotEqual(result['content'], '')
+        self.assertLess(len(result['content']), len(full['content']))
+        files, dirs = count_entries(result['content'])
+        self.assertGreater(dirs, 0)
+        self.assertEqual(result['stats'], {'files': files, 'dirs': dirs})
+
+    def test_cancel_during_render_truncates_stats(self):
+        cancel_event = threading.Event()
+        generator = FileTreeGenerator(self.config)
+        generator.RENDER_CHUNK_ENTRIES = 50
+        chunks = []
+        for chunk in generator.iter_generate(self.root, cancel_event):
+            chunks.append(chunk)
+            if len(chunks) == 2:
+                cancel_event.set()
+
+        content = ''.join(chunks)
+        self.assertEqual(len(chunks), 2)
+        self.assertEqual(len(generator.file_tree), 100)
+        files, dirs = count_entries(content)
+        self.assertEqual((generator.file_tree.file_count, generator.file_tree.dir_count), (files, dirs))
+
+    def test_without_cancel_matches_generate(self):
+        generator = FileTreeGenerator(self.config)
+        result = generator.generate(self.root, threading.Event())
+        files, dirs = count_entries(result['content'])
+        self.assertEqual(result['stats'], {'files': files, 'dirs': dirs})
+        self.assertEqual(dirs, 6 + 36 + 216)
+        self.assertEqual(files, 216 * 2)
+
+
+class RelativeRootTest(unittest.TestCase):
+    """以相对路径作为根目录"""
+
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.parent = Path(self._tmp.name)
+        for sub in ('src/pkg', 'docs'):
+            (self.parent / 'proj' / sub).mkdir(parents=True)
+        (self.parent / 'proj' / 'src' / 'pkg' / 'mod.py').touch()
+        (self.parent / 'proj' / 'docs' / 'index.md').touch()
+        (self.parent / 'proj' / 'setup.py').touch()
+
+        self.config = Config(self.parent)
+        self.config.max_depth = None
+        self.config.max_items_per_level = None
+
+        cwd = os.getcwd()
+        self.addCleanup(os.chdir, cwd)
+        self.addCleanup(self._tmp.cleanup)
+
+    def test_single_component_relative_root(self):
+        expected = FileTreeGenerator(self.config).generate(self.parent / 'proj')
+        os.chdir(self.parent)
+        result = FileTreeGenerator(self.config).generate(Path('proj'))
+        self.assertEqual(result['content'], expected['content'])
+        self.assertEqual(result['stats'], {'files': 3, 'dirs': 3})
+
+    def test_path_patterns_on_relative_root(self):
+        self.config.ignore_patterns = ['*/src/*']
+        os.chdir(self.parent)
+        result = FileTreeGenerator(self.config).generate(Path('proj'))
+        self.assertIn('src/', result['content'])
+        self.assertNotIn('pkg/', result['content'])
+
+
+def fnmatch_ignores(pattern: str, name: str, path_str: str, is_dir: bool) -> bool:
+    """
+    忽略清单语义的参照实现：逐个模式调用 fnmatch.fnmatch
+
+    不含 * 和 ? 的条目按名称精确匹配；以 / 结尾的模式只匹配目录；
+    包含 / 的模式匹配完整路径，其余匹配文件名
+    """
+    if pattern.endswith('/'):
+        pattern = pattern[:-1]
+        if not is_dir:
+            return False
+    elif '*' not in pattern and '?' not in pattern:
+        return name == pattern
+    return fnmatch.fnmatch(path_str if '/' in pattern else name, pattern)
+
+
+class MatcherTest(unittest.TestCase):
+    """分桶匹配器与 fnmatch 逐个匹配的结果一致"""
+
+    PATTERNS = [
+        # 精确匹配
+        'build', '[old]', 'a[b', 'x.py',
+        # 后缀、前缀
+        '*.pyc', '*~', 'test*',
+        # 只匹配文件名的通配符
+        '*.[oa]', 'f?o', '[!a]*z', '*test*', 'v[0-9]*', '*[',
+        # 匹配完整路径
+        '*/src/*', '*/docs/*.md', '/r/proj/o?t',
+        # 只匹配目录
+        'node_modules/', 'cache*/', '[old]/', '*/out/',
+    ]
+
+    NAMES = [
+        'build', '[old]', 'o', 'l', 'd', 'a[b', 'x.py', 'y.py', 'mod.pyc', 'mod.py', 'notes~',
+        'test', 'testing.py', 'my_test.py', 'lib.o', 'lib.a', 'lib.c', 'foo', 'fooo', 'bz', 'az',
+        'v1', 'vx', 'x[', 'node_modules', 'cache', 'cache_dir', 'out', 'ott', 'index.md',
+    ]
+
+    DIRS = ['/r/proj', '/r/proj/src', '/r/proj/docs', '/r/proj/a/out']
+
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self._tmp.cleanup)
+        self.config = Config(Path(self._tmp.name))
+        self.config.ignore_hidden = False
+
+    def entries(self):
+        """产出 (文件名, 完整路径, 是否为目录) 测试条目"""
+        for parent in self.DIRS:
+            for name in self.NAMES:
+                for is_dir in (False, True):
+                    yield name, parent + '/' + name, is_dir
+
+    def assert_matches_fnmatch(self, patterns):
+        self.config.ignore_patterns = patterns
+        generator = FileTreeGenerator(self.config)
+        for name, path_str, is_dir in self.entries():
+            expected = any(fnmatch_ignores(p, name, path_str, is_dir) for p in patterns)
+            self.assertEqual(generator.should_ignore(name, path_str, is_dir), expected,
+                             (patterns if len(patterns) == 1 else 'all', path_str, is_dir))
+        return generator
+
+    def test_each_pattern(self):
+        for pattern in self.PATTERNS:
+            self.assert_matches_fnmatch([pattern])
+
+    def test_all_patterns(self):
+        self.assert_matches_fnmatch(self.PATTERNS)
+
+    def test_bracket_only_entry_is_literal(self):
+        self.config.ignore_patterns = ['[old]']
+        generator = FileTreeGenerator(self.config)
+        self.assertTrue(generator.should_ignore('[old]', '/r/[old]', True))
+        for name in ('o', 'l', 'd'):
+            self.assertFalse(generator.should_ignore(name, '/r/' + name, False))
+
+    @unittest.skipIf(filetree_generator.hyperscan is None, '未安装 hyperscan')
+    def test_hyperscan_matchers(self):
+        # 每个正则桶都补足模式数，使其改用 hyperscan 编译
+        count = filetree_generator._HYPERSCAN_MIN_PATTERNS + 1
+        filler = []
+        for i in range(count):
+            filler += [f'never{i}?', f'*/never{i}/*', f'never{i}?/', f'*/never{i}/']
+        generator = self.assert_matches_fnmatch(self.PATTERNS + filler)
+        for matcher in generator._ignore_matchers[2:]:
+            self.assertIsInstance(matcher, filetree_generator._HyperscanMatcher)
+
+
+if __name__ == '__main__':
+    unittest.main()